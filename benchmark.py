@@ -0,0 +1,148 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from main import LogHandler
+
+STATUSES = ('Pass', 'Pass', 'Pass', 'Failed', 'Skip')
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {}
+
+    def pick(fraction):
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))] * 1e6
+
+    return {
+        'count': len(samples),
+        'p50_us': pick(0.50),
+        'p90_us': pick(0.90),
+        'p99_us': pick(0.99),
+        'max_us': samples[-1] * 1e6,
+    }
+
+
+def directory_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def peak_rss_bytes():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_scenario(tests, steps_per_test, options, work_dir):
+    """Drive one synthetic suite through LogHandler and return its measurements."""
+    report = os.path.join(work_dir, 'log.html')
+    if options.get('journal'):
+        options = dict(options, journal_path=os.path.join(work_dir, 'log.jsonl'))
+    options.pop('journal', None)
+    latencies = {name: [] for name in ('add_test_case', 'log_action_result', 'log_execution_end',
+                                       'generate_summary')}
+    clock = time.perf_counter
+
+    start = clock()
+    log_handler = LogHandler(report, snapshot_dir=os.path.join(work_dir, 'snapshots'), **options)
+    names = [f'Test_{i:06d}' for i in range(tests)]
+    for i, name in enumerate(names):
+        began = clock()
+        log_handler.add_test_case(name, f'Project_{i % 10}', 'Screen Comparison' if i % 2 else 'Text Comparison')
+        latencies['add_test_case'].append(clock() - began)
+    for i, name in enumerate(names):
+        log_handler.log_execution_start(name)
+        for step in range(steps_per_test):
+            began = clock()
+            log_handler.log_action_result(name, str(step + 1), 'Press Key', f'KEY_{step}',
+                                          STATUSES[(i + step) % len(STATUSES)])
+            latencies['log_action_result'].append(clock() - began)
+        began = clock()
+        log_handler.log_execution_end(name, STATUSES[i % len(STATUSES)])
+        latencies['log_execution_end'].append(clock() - began)
+    began = clock()
+    log_handler.generate_summary()
+    latencies['generate_summary'].append(clock() - began)
+    log_handler.close()
+    wall_time = clock() - start
+
+    return {
+        'tests': tests,
+        'steps': tests * steps_per_test,
+        'wall_time_s': wall_time,
+        'peak_rss_bytes': peak_rss_bytes(),
+        'report_bytes': os.path.getsize(report),
+        'output_bytes': sum(directory_size(os.path.join(work_dir, name)) for name in os.listdir(work_dir)),
+        'latency': {name: percentiles(samples) for name, samples in latencies.items()},
+        'handler_stats': log_handler.stats.as_dict(),
+    }
+
+
+def run_isolated(tests, steps_per_test, options):
+    # Each scenario runs in a fresh interpreter so peak RSS belongs to that scenario alone
+    command = [sys.executable, os.path.abspath(__file__), '--scenario', str(tests),
+               '--steps-per-test', str(steps_per_test), '--options', json.dumps(options)]
+    result = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True)
+    return json.loads(result.stdout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark LogHandler with synthetic suites.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 10000, 100000],
+                        help='number of tests per suite')
+    parser.add_argument('--steps-per-test', type=int, default=3)
+    parser.add_argument('--buffered', action='store_true', help='use LogHandler(buffered=True)')
+    parser.add_argument('--details', choices=('lazy', 'inline', 'sharded'), default='lazy')
+    parser.add_argument('--queue-mode', choices=('thread', 'process'))
+    parser.add_argument('--render-workers', type=int, default=0, help='render details on a pool of this size')
+    parser.add_argument('--journal', action='store_true', help='also write a JSONL journal')
+    parser.add_argument('-o', '--output', default='benchmark_results.json', help='JSON file for the results')
+    parser.add_argument('--scenario', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--options', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.scenario is not None:
+        with tempfile.TemporaryDirectory() as work_dir:
+            result = run_scenario(args.scenario, args.steps_per_test, json.loads(args.options), work_dir)
+        print(json.dumps(result))
+        return
+
+    options = {'buffered': args.buffered, 'details': args.details, 'queue_mode': args.queue_mode,
+               'journal': args.journal, 'render_workers': args.render_workers}
+    results = []
+    for tests in args.sizes:
+        result = run_isolated(tests, args.steps_per_test, options)
+        results.append(result)
+        print(f"{tests:>7} tests, {result['steps']:>7} steps: {result['wall_time_s']:8.2f}s wall, "
+              f"{result['peak_rss_bytes'] / 2 ** 20:7.1f} MiB peak RSS, "
+              f"{result['report_bytes'] / 2 ** 20:7.1f} MiB report, "
+              f"log_action_result p99 {result['latency']['log_action_result'].get('p99_us', 0):.1f}us")
+
+    with open(args.output, 'w') as file:
+        json.dump({
+            'generated': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'steps_per_test': args.steps_per_test,
+            'options': options,
+            'results': results,
+        }, file, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,41 +1,829 @@
+import asyncio
+import atexit
+import contextvars
+import gzip
+import hashlib
+import heapq
+import html
+import itertools
+import json
 import logging
 from logging.handlers import RotatingFileHandler
+import multiprocessing
 import os
+import queue
+import shutil
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
-import matplotlib.pyplot as plt
+
+
+class ReportStats:
+    """Counters for the reporting layer's own overhead."""
+
+    __slots__ = ('events', 'render_time', 'io_time', 'bytes_written')
+
+    def __init__(self):
+        self.events = 0
+        self.render_time = 0.0
+        self.io_time = 0.0
+        self.bytes_written = 0
+
+    def record_io(self, started, size):
+        self.io_time += time.perf_counter() - started
+        self.bytes_written += size
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class ReportWriter:
+    """Appends fragments to the report, rewriting only the closing tail.
+
+    The report is laid out as ``head + fragments + tail``.  Each flush seeks
+    to the byte offset where the tail starts, writes the pending fragments
+    followed by the tail again, so the cost of an event depends only on its
+    own size.  With ``batch_size`` above 1 fragments are held in memory until
+    the batch is full or ``flush_interval`` seconds have passed; with
+    ``batch_size=None`` only the interval (or an explicit flush) writes them.
+    """
+
+    def __init__(self, path, head, tail, batch_size=1, flush_interval=None, stats=None, publisher=None):
+        self.path = path
+        self.stats = stats or ReportStats()
+        self.publisher = publisher
+        self.tail = tail.encode('utf-8')
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.timer = None
+        self.lock = threading.Lock()
+        with open(self.path, 'wb') as file:
+            file.write(head.encode('utf-8'))
+            self.offset = file.tell()
+            file.write(self.tail)
+
+    def append(self, fragment):
+        with self.lock:
+            self.pending.append(fragment.encode('utf-8'))
+            if self.batch_size is not None and len(self.pending) >= self.batch_size:
+                self._flush()
+            elif self.flush_interval is not None and self.timer is None:
+                self.timer = threading.Timer(self.flush_interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return
+        data = b''.join(self.pending)
+        self.pending.clear()
+        if self.publisher is not None:
+            data += self.publisher.publish(data)
+        started = time.perf_counter()
+        with open(self.path, 'r+b') as file:
+            file.seek(self.offset)
+            file.write(data)
+            file.write(self.tail)
+            file.truncate()
+        self.stats.record_io(started, len(data) + len(self.tail))
+        self.offset += len(data)
+
+
+class LivePublisher:
+    """Publishes every flushed batch of report fragments as a small delta file.
+
+    ``delta_<n>.js`` holds the fragments of batch ``n`` and ``status.js`` the
+    latest batch number and the run's progress counters.  Both are written to
+    a temporary file and renamed into place, so a polling page never reads a
+    partial file, and it only downloads the batches it has not seen yet.
+    Files left in the directory by an earlier run are removed at start.
+    """
+
+    def __init__(self, directory, progress, stats=None):
+        self.directory = directory
+        self.progress = progress
+        self.stats = stats or ReportStats()
+        self.seq = 0
+        os.makedirs(self.directory, exist_ok=True)
+        for name in os.listdir(self.directory):
+            if name.startswith(('delta_', 'status.js')):
+                os.remove(os.path.join(self.directory, name))
+        self._write('status.js', 'liveStatus(0, null);\n')
+
+    def publish(self, data):
+        """Write batch ``data`` as the next delta and return the marker to append to the report."""
+        self.seq += 1
+        self._write(f'delta_{self.seq}.js', f'applyLiveDelta({self.seq}, {json.dumps(data.decode("utf-8"))});\n')
+        self._write('status.js', f'liveStatus({self.seq}, {json.dumps(self.progress())});\n')
+        return f'<template data-live-seq="{self.seq}"></template>\n'.encode('utf-8')
+
+    def _write(self, name, text):
+        data = text.encode('utf-8')
+        path = os.path.join(self.directory, name)
+        started = time.perf_counter()
+        with open(path + '.tmp', 'wb') as file:
+            file.write(data)
+        os.replace(path + '.tmp', path)
+        self.stats.record_io(started, len(data))
+
+
+class EventJournal:
+    """Append-only JSONL record of every LogHandler event.
+
+    The first line holds the run's generation time and working directory
+    (relative snapshot paths are resolved against it), every following line is
+    ``{"event": ..., "args": [...], "time": ...}`` where ``time`` is the
+    ``time.monotonic()`` value at which the event was logged.  Lines are written through
+    the file buffer and fsync'd every ``fsync_every`` events, on flush and on
+    close, so the journal can be rendered even if the test process dies.
+    """
+
+    def __init__(self, path, generation_time, fsync_every=100, stats=None):
+        self.path = path
+        self.stats = stats or ReportStats()
+        self.fsync_every = fsync_every
+        self.unsynced = 0
+        self.file = open(self.path, 'w', encoding='utf-8')
+        self.file.write(json.dumps({'event': 'start', 'generation_time': generation_time, 'cwd': os.getcwd()}) + '\n')
+
+    def record(self, event, args, timestamp):
+        # Arguments JSON can't hold, such as Path details or snapshot paths, are recorded as their str()
+        line = json.dumps({'event': event, 'args': args, 'time': timestamp}, default=str) + '\n'
+        started = time.perf_counter()
+        self.file.write(line)
+        self.stats.record_io(started, len(line))
+        self.unsynced += 1
+        if self.unsynced >= self.fsync_every:
+            self.flush()
+
+    def flush(self):
+        started = time.perf_counter()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.stats.record_io(started, 0)
+        self.unsynced = 0
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+
+class SnapshotStore:
+    """Content-addressed store for error snapshots.
+
+    Snapshots are hashed, copied into ``snapshot_dir`` as ``<sha256><ext>``
+    and given a thumbnail in ``snapshot_dir/thumbs`` on a background thread
+    pool, so identical screenshots are stored once and the caller only gets
+    back a future.  Thumbnails need Pillow; without it the full image is used.
+    """
+
+    def __init__(self, snapshot_dir, base_dir, workers=4, thumbnail_size=(240, 160)):
+        self.snapshot_dir = snapshot_dir
+        self.thumb_dir = os.path.join(snapshot_dir, 'thumbs')
+        self.base_dir = base_dir
+        self.thumbnail_size = thumbnail_size
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='SnapshotStore')
+        os.makedirs(self.thumb_dir, exist_ok=True)
+
+    def submit(self, path):
+        return self.executor.submit(self._store, path)
+
+    def _store(self, path):
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            # Keep the original reference so a missing snapshot still shows up as a broken image link
+            return path, path
+        digest = hashlib.sha256(data).hexdigest()
+        image_path = os.path.join(self.snapshot_dir, digest + os.path.splitext(path)[1].lower())
+        if not os.path.exists(image_path):
+            self._write_atomic(image_path, data)
+        thumb_path = os.path.join(self.thumb_dir, digest + '.png')
+        if not os.path.exists(thumb_path) and not self._make_thumbnail(image_path, thumb_path):
+            thumb_path = image_path
+        return self._url(image_path), self._url(thumb_path)
+
+    def _make_thumbnail(self, image_path, thumb_path):
+        try:
+            from PIL import Image
+        except ImportError:
+            return False
+        try:
+            with Image.open(image_path) as image:
+                image.thumbnail(self.thumbnail_size)
+                image.save(f'{thumb_path}.{threading.get_ident()}.tmp', 'PNG')
+        except OSError:
+            return False
+        os.replace(f'{thumb_path}.{threading.get_ident()}.tmp', thumb_path)
+        return True
+
+    @staticmethod
+    def _write_atomic(path, data):
+        # Workers storing the same content at once each use their own temporary file
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, path)
+
+    def _url(self, path):
+        return os.path.relpath(path, self.base_dir).replace(os.sep, '/')
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+class RunHistory:
+    """SQLite store of past runs for trend, regression and flakiness queries.
+
+    Every run gets a row in ``runs``; each finished test and its steps are
+    committed as the test ends, and the run's totals when the summary is
+    generated, so no write transaction stays open while tests run and a
+    crashed run keeps the tests it finished.  The indexes on run, test name, project and script
+    type keep the queries over the last N runs independent of how much
+    history has piled up.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY, generated TEXT, report TEXT,
+            total INTEGER, passed INTEGER, failed INTEGER, skipped INTEGER);
+        CREATE TABLE IF NOT EXISTS test_cases (
+            run_id INTEGER, name TEXT, project TEXT, script_type TEXT, node TEXT, status TEXT, duration REAL);
+        CREATE TABLE IF NOT EXISTS steps (
+            run_id INTEGER, test_name TEXT, step_number TEXT, action TEXT, detail TEXT, status TEXT, duration REAL);
+        CREATE INDEX IF NOT EXISTS test_cases_run ON test_cases (run_id);
+        CREATE INDEX IF NOT EXISTS test_cases_name ON test_cases (name, run_id);
+        CREATE INDEX IF NOT EXISTS test_cases_project ON test_cases (project, run_id);
+        CREATE INDEX IF NOT EXISTS test_cases_script_type ON test_cases (script_type, run_id);
+        CREATE INDEX IF NOT EXISTS steps_run ON steps (run_id, test_name);
+    """
+
+    def __init__(self, path, timeout=30.0):
+        self.path = path
+        # The connection is used from whichever thread applies events; LogHandler serializes that access.
+        # Runs sharing the database wait up to timeout seconds for each other's short write transactions,
+        # and WAL mode lets the summary queries read while another run writes.
+        self.connection = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(self.SCHEMA)
+
+    def start_run(self, generated, report):
+        cursor = self.connection.execute("INSERT INTO runs (generated, report) VALUES (?, ?)", (generated, report))
+        self.connection.commit()
+        return cursor.lastrowid
+
+    def add_test_case(self, run_id, tc):
+        self.connection.execute(
+            "INSERT INTO test_cases (run_id, name, project, script_type, node, status, duration) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (run_id, tc.name, tc.project, tc.script_type, tc.node, tc.status, tc.duration))
+        self.connection.executemany(
+            "INSERT INTO steps (run_id, test_name, step_number, action, detail, status, duration) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(run_id, tc.name, str(step.step_number), str(step.action), str(step.detail), step.status, step.duration)
+             for step in tc.steps])
+        self.connection.commit()
+
+    def finish_run(self, run_id, total, passed, failed, skipped):
+        self.connection.execute("UPDATE runs SET total = ?, passed = ?, failed = ?, skipped = ? WHERE id = ?",
+                                (total, passed, failed, skipped, run_id))
+        self.connection.commit()
+
+    def pass_rate_trend(self, last=20):
+        """(run id, generation time, total, passed, failed, skipped) for the last runs, oldest first."""
+        rows = self.connection.execute(
+            "SELECT id, generated, total, passed, failed, skipped FROM runs "
+            "WHERE total IS NOT NULL ORDER BY id DESC LIMIT ?", (last,)).fetchall()
+        return rows[::-1]
+
+    def test_history(self, name, last=20):
+        """(run id, status, duration) of one test over the last runs, oldest first."""
+        rows = self.connection.execute(
+            "SELECT run_id, status, duration FROM test_cases WHERE name = ? ORDER BY run_id DESC LIMIT ?",
+            (name, last)).fetchall()
+        return rows[::-1]
+
+    def duration_regressions(self, last=20, factor=1.5, min_duration=0.1):
+        """Tests of the latest run that took ``factor`` times longer than their average over earlier runs."""
+        return self.connection.execute(
+            """
+            WITH recent AS (SELECT id FROM runs ORDER BY id DESC LIMIT ?),
+                 latest AS (SELECT MAX(id) AS id FROM runs)
+            SELECT current.name, current.project, current.duration, AVG(previous.duration) AS average
+            FROM test_cases AS current
+            JOIN test_cases AS previous
+                ON previous.name = current.name AND previous.run_id < current.run_id
+                AND previous.run_id IN recent
+            WHERE current.run_id = (SELECT id FROM latest) AND current.duration >= ?
+                AND previous.duration IS NOT NULL
+            GROUP BY current.name
+            HAVING current.duration > ? * average
+            ORDER BY current.duration / average DESC
+            """, (last, min_duration, factor)).fetchall()
+
+    def flaky_tests(self, last=20, limit=20):
+        """(name, project, status flips, runs) for tests that went between Pass and Failed in the last runs."""
+        return self.connection.execute(
+            """
+            WITH recent AS (SELECT id FROM runs ORDER BY id DESC LIMIT ?),
+                 history AS (
+                    SELECT name, project, lower(status) AS status,
+                           LAG(lower(status)) OVER (PARTITION BY name ORDER BY run_id) AS previous
+                    FROM test_cases
+                    WHERE run_id IN recent AND lower(status) IN ('pass', 'failed'))
+            SELECT name, project, SUM(status != previous) AS flips, COUNT(*) AS runs
+            FROM history
+            GROUP BY name
+            HAVING flips > 0
+            ORDER BY flips DESC, name
+            LIMIT ?
+            """, (last, limit)).fetchall()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+
+# Test started in the current thread or asyncio task, used to attribute log records to it
+current_test = contextvars.ContextVar('current_test', default=None)
+
+
+def gzip_rotator(source, dest):
+    with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+class JsonLogFormatter(logging.Formatter):
+    """Formats log records as one JSON object per line."""
+
+    def format(self, record):
+        entry = {'time': self.formatTime(record), 'level': record.levelname, 'logger': record.name,
+                 'test': getattr(record, 'test_name', None) or current_test.get(), 'message': record.getMessage()}
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class TestLogBuffer(logging.Handler):
+    """Keeps the last log lines of every running test for its details block.
+
+    A record belongs to the test named by ``extra={'test_name': ...}``, or
+    else to the test started in the current thread or task.  At most
+    ``max_lines`` lines of ``max_length`` characters are kept per test, and
+    they are released when the test ends, so memory is bounded by the
+    number of tests running at once.
+    """
+
+    def __init__(self, max_lines=200, max_length=500):
+        super().__init__(logging.DEBUG)
+        self.max_lines = max_lines
+        self.max_length = max_length
+        self.buffers = {}
+
+    def emit(self, record):
+        test_name = getattr(record, 'test_name', None) or current_test.get()
+        if test_name is None:
+            return
+        try:
+            line = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        if len(line) > self.max_length:
+            line = line[:self.max_length - 3] + '...'
+        buffer = self.buffers.get(test_name)
+        if buffer is None:
+            buffer = self.buffers[test_name] = [deque(maxlen=self.max_lines), 0]
+        buffer[0].append(line)
+        buffer[1] += 1
+
+    def take(self, test_name):
+        """Remove and return a test's kept lines, led by a note if earlier ones were dropped."""
+        self.acquire()
+        try:
+            buffer = self.buffers.pop(test_name, None)
+        finally:
+            self.release()
+        if buffer is None:
+            return []
+        lines, count = list(buffer[0]), buffer[1]
+        if count > len(lines):
+            lines.insert(0, f'[{count - len(lines)} earlier lines not kept]')
+        return lines
+
+
+class LogClient:
+    """Producer side of a queued LogHandler.
+
+    Every call only puts an event on the queue; the handler's writer thread
+    owns the report.  Pass it to worker threads, or to ``multiprocessing``
+    workers when the handler was created with ``queue_mode='process'``.
+    """
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def add_test_case(self, test_name, project, script_type):
+        self._put('add_test_case', test_name, project, script_type)
+
+    def add_test_step(self, test_name, step_number, action, detail, status, *args):
+        self._put('add_test_step', test_name, step_number, action, detail, status, *args)
+
+    def update_test_case_status(self, test_name, status):
+        self._put('update_test_case_status', test_name, status)
+
+    def log_execution_start(self, test_name):
+        current_test.set(test_name)
+        self._put('log_execution_start', test_name)
+
+    def log_action_result(self, test_name, step_number, action, detail, status, *args):
+        self._put('log_action_result', test_name, step_number, action, detail, status, *args)
+
+    def log_execution_end(self, test_name, status):
+        if current_test.get() == test_name:
+            current_test.set(None)
+        self._put('log_execution_end', test_name, status)
+
+    def _put(self, event, *args):
+        # Timestamped here so durations reflect when the test logged the event, not when it was written
+        self.queue.put((event, args, time.monotonic()))
+
+
+def status_index(status):
+    """Position of a status in the [passed, failed, skipped] counts; anything else counts as skipped."""
+    status = status.lower()
+    if status == 'pass':
+        return 0
+    if status == 'failed':
+        return 1
+    return 2
+
+
+class StatusCounter:
+    """Running Passed/Failed/Skip counts, overall and per project, script type and node.
+
+    Every entry is ``[passed, failed, skipped, timed, time]``; the last two
+    are the number of tests (or steps) with a duration and their total time.
+    Counts are updated as events arrive, so reading them never scans the run.
+    """
+
+    DIMENSIONS = ('project', 'script_type', 'node')
+
+    def __init__(self):
+        self.total = [0, 0, 0, 0, 0.0]
+        self.groups = {dimension: {} for dimension in self.DIMENSIONS}
+
+    def _entries(self, tc):
+        yield self.total
+        for dimension, groups in self.groups.items():
+            key = getattr(tc, dimension)
+            if key is not None:
+                entry = groups.get(key)
+                if entry is None:
+                    entry = groups[key] = [0, 0, 0, 0, 0.0]
+                yield entry
+
+    def count(self, tc, status, delta=1):
+        index = status_index(status)
+        for entry in self._entries(tc):
+            entry[index] += delta
+
+    def add_time(self, tc, seconds):
+        for entry in self._entries(tc):
+            entry[3] += 1
+            entry[4] += seconds
+
+
+class TestStep:
+    __slots__ = ('test_case', 'step_number', 'action', 'detail', 'status', 'snapshot', 'start_time', 'end_time')
+
+    def __init__(self, test_case, step_number, action, detail, status, snapshot=(), start_time=None, end_time=None):
+        self.test_case = test_case
+        self.step_number = step_number
+        self.action = action
+        self.detail = detail
+        self.status = status
+        self.snapshot = snapshot
+        self.start_time = start_time
+        self.end_time = end_time
+
+    @property
+    def duration(self):
+        if self.start_time is None or self.end_time is None:
+            return None
+        return self.end_time - self.start_time
+
+
+class TestCase:
+    __slots__ = ('name', 'project', 'script_type', 'steps', 'status', 'start_time', 'end_time', 'node', 'step_counts')
+
+    def __init__(self, name, project, script_type, status='Skip', node=None):
+        self.name = name
+        self.project = project
+        self.script_type = script_type
+        self.steps = []
+        self.status = status
+        self.node = node
+        self.step_counts = [0, 0, 0]
+        self.start_time = None
+        self.end_time = None
+
+    @property
+    def duration(self):
+        if self.start_time is None or self.end_time is None:
+            return None
+        return self.end_time - self.start_time
+
+
+def render_test_details(job):
+    """Render one test's collapsible details fragment.
+
+    Jobs and results are plain data, so this runs the same on the logging
+    thread or in a render pool worker process. Returns the fragment and the
+    number of bytes written to the test's shard file, if it has one.
+    """
+    name, status, step_counts, duration, details, steps, shard_dir, shard, log_lines, text_log_url = job
+    passed_actions, failed_actions, not_run_actions = step_counts
+    tc_status_color = '#4CAF50' if status.lower() == 'pass' else '#f44336'
+    shard_attribute = f" data-shard='{shard}'" if shard is not None else ""
+    written = 0
+    parts = [f"<button type='button' class='collapsible'><span class='collapsible-sign'>+</span> "
+             f"<span class='collapsible-text' style='background-color: {tc_status_color}; color: white;'>"
+             f"{name}</span></button>",
+             f"<div class='collapsible-content'{shard_attribute}><p>Summary: <b>Total:</b> "
+             f"{passed_actions + failed_actions + not_run_actions},  "
+             f"<b style='color:green;'>Passed:</b> {passed_actions}, "
+             f"<b style='color:red;'>Failed:</b> {failed_actions}, "
+             f"<b style='color:grey;'>Skip:</b> {not_run_actions}, "
+             f"<b>Duration:</b> {duration}</p>"]
+    if log_lines:
+        log_text = html.escape('\n'.join(log_lines))
+        parts.append(f"<p>Log: last {len(log_lines)} lines, the full log is in "
+                     f"<a href='{text_log_url}' target='_blank'>{os.path.basename(text_log_url)}</a></p>"
+                     f"<pre class='test-log'>{log_text}</pre>")
+
+    # 'inline' renders the steps here; otherwise they are kept as JSON and rendered by the page on first expand,
+    # either from a script block inside the test's content or, in sharded mode, from the test's shard file
+    if details == 'inline':
+        for action, step_status, detail, snapshots, step_duration in steps:
+            action_status_color = '#4CAF50' if step_status.lower() == 'pass' else '#f44336'
+            parts.append(f"<button type='button' class='collapsible'><span class='collapsible-sign'>+</span> "
+                         f"<span style='background-color: {action_status_color}; color: white;'>{action}</span>"
+                         f"</button><div class='collapsible-content'>"
+                         f"<p>Status: <span class='status-{step_status.lower()}'>{step_status}</span></p>"
+                         f"<p>Details: {detail}</p><p>Duration: {step_duration}</p>")
+            for image, thumb in snapshots:
+                parts.append(f"<a href='{image}' target='_blank'>"
+                             f"<img class='snapshot-thumb' src='{thumb}' loading='lazy'></a>")
+            parts.append("</div>")
+    else:
+        steps_data = json.dumps(steps)
+        if shard is not None:
+            data = f'loadDetailShard("{shard}", {steps_data});\n'.encode('utf-8')
+            with open(os.path.join(shard_dir, f'{shard}.js'), 'wb') as file:
+                file.write(data)
+            written = len(data)
+        else:
+            # Escape '</' so a detail containing '</script>' can't end the data block early
+            steps_data = steps_data.replace('</', '<\\/')
+            parts.append(f'<script type="application/json">{steps_data}</script>')
+    parts.append("</div>")
+    return LogHandler._generate_fragment('test_log_information', ''.join(parts), 'prepend'), written
+
+
+def render_test_details_chunk(jobs):
+    return [render_test_details(job) for job in jobs]
+
+
+def when_all_done(futures, callback):
+    # Calls callback() once every future is done, on the thread that finishes the last one
+    pending = [future for future in futures if not future.done()]
+    if not pending:
+        callback()
+        return
+    remaining = [len(pending)]
+    lock = threading.Lock()
+
+    def done(_):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            callback()
+
+    for future in pending:
+        future.add_done_callback(done)
 
 
 class LogHandler:
-    def __init__(self, log_file_path, snapshot_dir='snapshots'):
+    instance_ids = itertools.count(1)
+
+    def __init__(self, log_file_path, snapshot_dir='snapshots', buffered=False, flush_every=100, flush_interval=5.0,
+                 queue_mode=None, chart='svg', journal_path=None, generation_time=None, details='lazy',
+                 snapshot_workers=4, slowest_count=10, history_db=None, history_runs=20, retain_steps='memory',
+                 live=False, live_interval=2.0, render_workers=0, render_pool='process', render_chunk=32,
+                 text_log_path=None, text_log_format='text', text_log_compress=False, text_log_bytes=5 * 1024 * 1024,
+                 text_log_backups=2, test_log_lines=200, test_log_line_length=500, report=True,
+                 journal_fsync_every=100):
+        if details not in ('lazy', 'inline', 'sharded'):
+            raise ValueError(f"Unknown details: {details!r}")
+        if not report:
+            if journal_path is None:
+                raise ValueError("report=False needs a journal_path")
+            if live or history_db is not None:
+                raise ValueError("live and history_db need report=True; pass them to render_journal instead")
         self.log_file_path = log_file_path
+        self.report = report
+        # Counters for the time and bytes the reporting layer itself costs
+        self.stats = ReportStats()
+        self.event_time = time.monotonic()
+        self.slowest_count = slowest_count
+        # 'svg' draws the summary charts inline in the report; 'png' renders them with matplotlib
+        if chart not in ('svg', 'png'):
+            raise ValueError(f"Unknown chart: {chart!r}")
+        self.chart = chart
+        self.chart_path = os.path.splitext(log_file_path)[0] + '_summary.png'
         self.start_time = datetime.now()
         self.test_cases = []
-        # Initialize logging
-        self.logger = logging.getLogger('TestExecutionLogger')
+        self.test_case_index = {}
+        # Running totals at test and step level, and a bounded heap of the slowest tests
+        self.test_counts = StatusCounter()
+        self.step_counts = StatusCounter()
+        self.slowest = []
+        self.unfinished = set()
+        self.lock = threading.RLock()
+        self.closed = False
+        # Initialize logging. Every instance gets a logger of its own, numbered so reports that share a name
+        # (a/log.html and b/log.html) never share handlers
+        self.logger = logging.getLogger('TestExecutionLogger').getChild(
+            f'{os.path.splitext(os.path.basename(log_file_path))[0]}-{next(self.instance_ids)}')
         self.logger.setLevel(logging.DEBUG)
 
-        # Create a rotating file handler
-        self.handler = RotatingFileHandler(log_file_path, maxBytes=5 * 1024 * 1024, backupCount=2)
+        # The text log rotates on its own file next to the report (<report>.log by default), as plain text or
+        # with text_log_format='json' as JSONL. With text_log_compress rotated files are gzipped.
+        self.text_log_path = text_log_path or os.path.splitext(log_file_path)[0] + '.log'
+        if os.path.abspath(self.text_log_path) == os.path.abspath(log_file_path):
+            raise ValueError("text_log_path must differ from the report path")
+        self.text_log_url = os.path.relpath(os.path.abspath(self.text_log_path),
+                                            os.path.dirname(os.path.abspath(log_file_path))).replace(os.sep, '/')
+        self.handler = RotatingFileHandler(self.text_log_path, maxBytes=text_log_bytes, backupCount=text_log_backups)
         self.handler.setLevel(logging.DEBUG)
+        if text_log_compress:
+            self.handler.namer = lambda name: name + '.gz'
+            self.handler.rotator = gzip_rotator
 
         # Create a logging format
         self.formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        self.handler.setFormatter(self.formatter)
+        if text_log_format == 'json':
+            self.handler.setFormatter(JsonLogFormatter())
+        elif text_log_format == 'text':
+            self.handler.setFormatter(self.formatter)
+        else:
+            raise ValueError(f"Unknown text_log_format: {text_log_format!r}")
 
         # Add the handler to the logger
         self.logger.addHandler(self.handler)
 
-        # Create a directory for error snapshots if it doesn't exist
+        # The last test_log_lines lines each test logs through self.logger are shown in its details
+        self.test_logs = None
+        if test_log_lines:
+            self.test_logs = TestLogBuffer(test_log_lines, test_log_line_length)
+            self.test_logs.setFormatter(self.formatter)
+            self.logger.addHandler(self.test_logs)
+
+        # 'lazy' embeds each test's steps as JSON that the page renders when the test is expanded,
+        # 'inline' writes them as HTML, and 'sharded' moves them to a <report>_details/<n>.js file
+        self.details = details
+        self.shard_count = 0
+        self.shard_dir = os.path.splitext(log_file_path)[0] + '_details'
+        self.shard_url = os.path.basename(self.shard_dir) + '/'
+        if self.details == 'sharded':
+            os.makedirs(self.shard_dir, exist_ok=True)
+
+        # A test's details are rendered once its snapshots are stored, so ending a test never waits on image
+        # I/O; finished fragments are appended in the order the tests ended. With render_workers they are
+        # rendered on a pool (worker processes by default, or threads with render_pool='thread') in chunks of
+        # render_chunk tests. At most two chunks per worker are left waiting, so the pool can't run far ahead
+        # of the report; a partial chunk is rendered on flush() and generate_summary().
+        self.render_workers = render_workers
+        self.render_chunk = render_chunk
+        self.render_lock = threading.Lock()
+        self.render_jobs = []
+        self.renders = deque()
+        self.render_executor = None
+        if render_workers:
+            if render_pool == 'process':
+                # Workers start after the writer, snapshot and timer threads, so they must not be forked from
+                # this process; a forked worker could inherit a lock held by one of those threads
+                start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                self.render_executor = ProcessPoolExecutor(render_workers,
+                                                           mp_context=multiprocessing.get_context(start_method))
+            elif render_pool == 'thread':
+                self.render_executor = ThreadPoolExecutor(render_workers, thread_name_prefix='LogHandlerRender')
+            else:
+                raise ValueError(f"Unknown render_pool: {render_pool!r}")
+
+        # Create a directory for error snapshots if it doesn't exist. Snapshots are copied into it by content
+        # hash on a background pool, and the report links to them relative to its own directory
         if not os.path.exists(snapshot_dir):
             os.makedirs(snapshot_dir)
         self.snapshot_dir = snapshot_dir
+        self.snapshots = SnapshotStore(snapshot_dir, os.path.dirname(os.path.abspath(log_file_path)),
+                                       snapshot_workers)
 
         # Store the current time as the log generation time
-        self.log_generation_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.log_generation_time = generation_time or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        # Optional SQLite store of every run, used for the trend, regression and flaky test sections
+        self.history = None
+        self.history_runs = history_runs
+        if history_db is not None:
+            self.history = RunHistory(history_db)
+            self.history_run_id = self.history.start_run(self.log_generation_time, os.path.abspath(log_file_path))
+            self.history_saved = set()
+
+        # What happens to a test's steps once its details are written: 'memory' keeps them, 'spill' moves
+        # them to <report>_steps.jsonl (see load_steps) and 'drop' discards them. Only the test records and
+        # the running counters stay in memory with the last two, so memory follows the largest single test.
+        if retain_steps not in ('memory', 'spill', 'drop'):
+            raise ValueError(f"Unknown retain_steps: {retain_steps!r}")
+        self.retain_steps = retain_steps
+        self.spill_path = os.path.splitext(log_file_path)[0] + '_steps.jsonl'
+        self.spill_offsets = {}
+        self.spill_lock = threading.Lock()
+        self.spill_file = open(self.spill_path, 'w+b') if retain_steps == 'spill' else None
+
+        # The journal records every event so the report can be rebuilt later with render_journal. With
+        # report=False only the journal is written, and the HTML is built afterwards by render_report.
+        self.journal = None
+        if journal_path is not None:
+            self.journal = EventJournal(journal_path, self.log_generation_time, journal_fsync_every, self.stats)
 
-        # Create or overwrite the log file
-        with open(self.log_file_path, 'w') as file:
-            file.write(self._generate_html_header())
+        # In live mode every flushed batch is also published to <report>_live/ for the page to poll
+        self.live = live
+        self.live_interval = live_interval
+        self.live_dir = os.path.splitext(log_file_path)[0] + '_live'
+        self.live_url = os.path.basename(self.live_dir) + '/'
+        publisher = LivePublisher(self.live_dir, self.progress, self.stats) if live else None
+
+        # Create or overwrite the log file. In buffered mode fragments are written in batches, after every
+        # flush_every events (counted in _apply) or every flush_interval seconds, and whatever is left is
+        # flushed at exit. Live mode always batches, at least every live_interval seconds, so it publishes one
+        # delta per batch rather than one per fragment.
+        self.flush_every = flush_every if buffered else None
+        self.unflushed_events = 0
+        if live:
+            if flush_interval is None or not buffered:
+                flush_interval = live_interval
+            else:
+                flush_interval = min(flush_interval, live_interval)
+        if not report:
+            self.writer = None
+        elif buffered or live:
+            self.writer = ReportWriter(self.log_file_path, self._generate_html_header(),
+                                       self._generate_html_footer(), None, flush_interval, self.stats, publisher)
+        else:
+            self.writer = ReportWriter(self.log_file_path, self._generate_html_header(),
+                                       self._generate_html_footer(), stats=self.stats, publisher=publisher)
+
+        # In queue mode callers only enqueue events and a single writer thread applies them, so
+        # threads or worker processes (through client()) never touch the report themselves.
+        if queue_mode == 'thread':
+            self.queue = queue.SimpleQueue()
+        elif queue_mode == 'process':
+            self.queue = multiprocessing.Queue()
+        elif queue_mode is None:
+            self.queue = None
+        else:
+            raise ValueError(f"Unknown queue_mode: {queue_mode!r}")
+        self.flush_done = threading.Condition()
+        self.flush_requests = self.flushed = 0
+        if self.queue is not None:
+            self.writer_thread = threading.Thread(target=self._process_queue, name='LogHandlerWriter', daemon=True)
+            self.writer_thread.start()
+        self.exit_registered = False
+        if buffered or live or self.queue is not None or self.journal is not None:
+            self._register_exit()
+
+    def _register_exit(self):
+        # Close at exit so nothing held back for a batch, the queue or a deferred render is lost
+        if not self.exit_registered:
+            self.exit_registered = True
+            atexit.register(self.close)
 
     def _generate_html_header(self):
         return f"""
@@ -176,6 +964,20 @@ class LogHandler:
                 .collapsible-content.show {{
                     display: block;
                 }}
+                .test-log {{
+                    max-height: 300px;
+                    overflow: auto;
+                    background: #f8f8f8;
+                    border: 1px solid #ccc;
+                    padding: 5px;
+                    font-size: 12px;
+                }}
+                .snapshot-thumb {{
+                    max-width: 240px;
+                    max-height: 160px;
+                    margin: 5px;
+                    border: 1px solid #ccc;
+                }}
                 .content {{
                     padding: 0 20px;
                     display: none;
@@ -184,12 +986,14 @@ class LogHandler:
                     border-top: 1px solid #ddd;
                 }}
             </style>
+            {self._generate_html_script()}
         </head>
         <body>
             <header>
                 <div class="container">
                     <h1>Test Execution Log</h1>
                     <div class="log-time" id="log-time"></div>
+                    <div id="live-progress"></div>
                 </div>
             </header>
             <div class="container">
@@ -206,6 +1010,7 @@ class LogHandler:
                             <th>Project</th>
                             <th>Script Type</th>
                             <th>Status</th>
+                            <th>Duration</th>
                         </tr>
                     </thead>
                         <tbody id="test_cases">
@@ -221,11 +1026,16 @@ class LogHandler:
                 </section>
                 
             </div>
+        """
+
+    def _generate_html_script(self):
+        # The script only runs on DOMContentLoaded, so it sits in <head> and keeps the rewritten tail tiny
+        return f"""
             <script>
-                function updateTime() {{
+                function updateTime(finishedTime) {{
                     const logTimeElement = document.getElementById('log-time');
                     const generatedTime = new Date("{self.log_generation_time}");
-                    const currentTime = new Date();
+                    const currentTime = finishedTime ? new Date(finishedTime) : new Date();
                     const elapsedTime = Math.floor((currentTime - generatedTime) / 1000); // in seconds
 
                     const hours = Math.floor(elapsedTime / 3600);
@@ -236,31 +1046,187 @@ class LogHandler:
                     ${{minutes}}m ${{seconds}}s`;
                 }}
                 
+                function applyFragments() {{
+                    var fragments = document.querySelectorAll('template[data-target]');
+                    for (var i = 0; i < fragments.length; i++) {{
+                        var fragment = fragments[i];
+                        var target = document.getElementById(fragment.dataset.target);
+                        if (!target) {{
+                            fragment.remove();
+                            continue;
+                        }}
+                        if (fragment.dataset.mode === 'replace') {{
+                            target.replaceWith(fragment.content);
+                        }} else if (fragment.dataset.mode === 'prepend') {{
+                            target.prepend(fragment.content);
+                        }} else {{
+                            target.appendChild(fragment.content);
+                        }}
+                        fragment.remove();
+                    }}
+                }}
+
+                function renderSteps(content, steps) {{
+                    // Each step is [action, status, detail, [[image, thumbnail], ...], duration]
+                    var html = [];
+                    for (var i = 0; i < steps.length; i++) {{
+                        var step = steps[i];
+                        var status = step[1].toLowerCase();
+                        var color = status === 'pass' ? '#4CAF50' : '#f44336';
+                        html.push("<button type='button' class='collapsible'><span class='collapsible-sign'>+</span> " +
+                                  "<span style='background-color: " + color + "; color: white;'>" + step[0] +
+                                  "</span></button><div class='collapsible-content'><p>Status: <span class='status-" +
+                                  status + "'>" + step[1] + "</span></p><p>Details: " + step[2] + "</p><p>Duration: " +
+                                  step[4] + "</p>");
+                        for (var j = 0; j < step[3].length; j++) {{
+                            html.push("<a href='" + step[3][j][0] + "' target='_blank'><img class='snapshot-thumb' src='" +
+                                      step[3][j][1] + "' loading='lazy'></a>");
+                        }}
+                        html.push("</div>");
+                    }}
+                    content.insertAdjacentHTML('beforeend', html.join(''));
+                }}
+
+                function loadSteps(content) {{
+                    content.dataset.loaded = "true";
+                    if (content.dataset.shard) {{
+                        var script = document.createElement('script');
+                        script.src = "{self.shard_url}" + content.dataset.shard + ".js";
+                        document.body.appendChild(script);
+                        return;
+                    }}
+                    var data = content.querySelector(':scope > script[type="application/json"]');
+                    if (data) {{
+                        renderSteps(content, JSON.parse(data.textContent));
+                        data.remove();
+                    }}
+                }}
+
+                function toggleCollapsible(button) {{
+                    button.classList.toggle("active");
+                    var content = button.nextElementSibling;
+                    var sign = button.querySelector('.collapsible-sign');
+                    if (content.style.display === "block") {{
+                        content.style.display = "none";
+                        sign.textContent = "+";
+                    }} else {{
+                        content.style.display = "block";
+                        sign.textContent = "-";
+                        if (!content.dataset.loaded) {{
+                            loadSteps(content);
+                        }}
+                    }}
+                }}
+
+                // Called by the detail shard files, which are loaded the first time a test is expanded
+                function loadDetailShard(shard, steps) {{
+                    renderSteps(document.querySelector('[data-shard="' + shard + '"]'), steps);
+                }}
+
+                var elapsedTimer = null;
+                var liveTimer = null;
+                var liveSeq = 0;
+                var liveLatest = 0;
+
+                function checkFinished() {{
+                    var finished = document.querySelectorAll('template[data-finished]');
+                    if (!finished.length) {{
+                        return false;
+                    }}
+                    updateTime(finished[finished.length - 1].dataset.finished);
+                    clearInterval(elapsedTimer);
+                    clearInterval(liveTimer);
+                    return true;
+                }}
+
+                function loadScript(src) {{
+                    var script = document.createElement('script');
+                    script.src = src;
+                    script.onload = script.onerror = function() {{ script.remove(); }};
+                    document.body.appendChild(script);
+                }}
+
+                // Live mode: status.js names the latest published delta, and the deltas are fetched one
+                // at a time in order so each is applied exactly once
+                var liveLoading = false;
+
+                function loadNextDelta() {{
+                    if (liveLoading || liveSeq >= liveLatest) {{
+                        return;
+                    }}
+                    liveLoading = true;
+                    var script = document.createElement('script');
+                    script.src = "{self.live_url}delta_" + (liveSeq + 1) + ".js";
+                    script.onload = function() {{
+                        script.remove();
+                        liveLoading = false;
+                        loadNextDelta();
+                    }};
+                    // A failed delta is retried on the next status poll
+                    script.onerror = function() {{
+                        script.remove();
+                        liveLoading = false;
+                    }};
+                    document.body.appendChild(script);
+                }}
+
+                function liveStatus(seq, progress) {{
+                    if (progress) {{
+                        document.getElementById('live-progress').textContent = progress.tests + ' tests (' +
+                            progress.passed + ' passed, ' + progress.failed + ' failed, ' + progress.finished +
+                            ' finished), ' + progress.steps + ' steps';
+                    }}
+                    liveLatest = Math.max(liveLatest, seq);
+                    loadNextDelta();
+                }}
+
+                function applyLiveDelta(seq, html) {{
+                    if (seq !== liveSeq + 1) {{
+                        return;
+                    }}
+                    liveSeq = seq;
+                    document.body.insertAdjacentHTML('beforeend', html);
+                    applyFragments();
+                    checkFinished();
+                }}
+
                 document.addEventListener('DOMContentLoaded', function() {{
-                    updateTime();
-                    setInterval(updateTime, 1000);
-
-                    var coll = document.getElementsByClassName("collapsible");
-                    for (var i = 0; i < coll.length; i++) {{
-                        coll[i].addEventListener("click", function() {{
-                            this.classList.toggle("active");
-                            var content = this.nextElementSibling;
-                            var sign = this.querySelector('.collapsible-sign');
-                            if (content.style.display === "block") {{
-                                content.style.display = "none";
-                                sign.textContent = "+";
-                            }} else {{
-                                content.style.display = "block";
-                                sign.textContent = "-";
+                    applyFragments();
+                    if (!checkFinished()) {{
+                        updateTime();
+                        elapsedTimer = setInterval(updateTime, 1000);
+                        if ({'true' if self.live else 'false'}) {{
+                            var published = document.querySelectorAll('template[data-live-seq]');
+                            if (published.length) {{
+                                liveSeq = liveLatest = Number(published[published.length - 1].dataset.liveSeq);
                             }}
-                        }});
+                            liveTimer = setInterval(function() {{
+                                loadScript("{self.live_url}status.js?" + Date.now());
+                            }}, {int(self.live_interval * 1000)});
+                        }}
                     }}
+                    var testLogInformation = document.getElementById('test_log_information');
+                    testLogInformation.addEventListener("click", function(event) {{
+                        var button = event.target.closest('.collapsible');
+                        if (button && testLogInformation.contains(button)) {{
+                            toggleCollapsible(button);
+                        }}
+                    }});
                 }});
             </script>
+        """
+
+    @staticmethod
+    def _generate_html_footer():
+        return """
         </body>
         </html>
         """
 
+    @staticmethod
+    def _generate_fragment(target, html, mode='append'):
+        return f'<template data-target="{target}" data-mode="{mode}">{html}</template>\n'
+
     @staticmethod
     def _generate_test_case_row(test_name, project, script_type):
         return f"""
@@ -269,82 +1235,72 @@ class LogHandler:
             <td>{project}</td>
             <td>{script_type}</td>
             <td id="{test_name}_status" class="skip">Skip</td>
+            <td id="{test_name}_duration"></td>
         </tr>
         """
 
-    def add_test_case(self, test_name, project, script_type):
-        self.test_cases.append({
-            'name': test_name,
-            'project': project,
-            'script_type': script_type,
-            'steps': [],
-            'status': 'Skip'
-        })
-        with open(self.log_file_path, 'r+') as file:
-            content = file.read()
-            index = content.index('</tbody>')
-            content = content[:index] + self._generate_test_case_row(test_name, project, script_type) + content[index:]
-            file.seek(0)
-            file.write(content)
-            file.truncate()
+    def _add_test_case(self, test_name, project, script_type, node=None):
+        test_case = TestCase(test_name, project, script_type, node=node)
+        self.test_cases.append(test_case)
+        self.test_case_index[test_name] = test_case
+        self.test_counts.count(test_case, test_case.status)
+        self.unfinished.add(test_name)
+        self.writer.append(self._generate_fragment('test_cases',
+                                                   self._generate_test_case_row(test_name, project, script_type)))
 
-    def add_test_step(self, test_name, step_number, action, detail, status, *args):
-        for test_case in self.test_cases:
-            if test_case['name'] == test_name:
-                if args:
-                    test_case['steps'].append({
-                        'test_case': test_name,
-                        'step_number': step_number,
-                        'action': action,
-                        'detail': detail,
-                        'status': status,
-                        'snapshot': args
-                    })
-                else:
-                    test_case['steps'].append({
-                        'test_case': test_name,
-                        'step_number': step_number,
-                        'action': action,
-                        'detail': detail,
-                        'status': status
-                    })
-                break
+    def _add_test_step(self, test_name, step_number, action, detail, status, *args):
+        test_case = self.test_case_index.get(test_name)
+        if test_case is not None:
+            snapshot = tuple(self.snapshots.submit(path) for path in args)
+            # Only the end of a step is logged, so a step is taken to start when the previous one ended
+            if test_case.steps:
+                start_time = test_case.steps[-1].end_time
+            elif test_case.start_time is not None:
+                start_time = test_case.start_time
+            else:
+                start_time = test_case.start_time = self.event_time
+            step = TestStep(test_name, step_number, action, detail, status, snapshot, start_time, self.event_time)
+            test_case.steps.append(step)
+            test_case.step_counts[status_index(status)] += 1
+            self.step_counts.count(test_case, status)
+            self.step_counts.add_time(test_case, step.duration)
 
-    def update_test_case_status(self, test_name, status):
-        for test_case in self.test_cases:
-            if test_case['name'] == test_name:
-                test_case['status'] = status
-                break
-        with open(self.log_file_path, 'r+') as file:
-            content = file.read()
-            content = content.replace(f'id="{test_name}_status" class="skip">Skip',
-                                      f'id="{test_name}_status" class="{status.lower()}">{status}')
-            file.seek(0)
-            file.write(content)
-            file.truncate()
+    def _update_test_case_status(self, test_name, status):
+        test_case = self.test_case_index.get(test_name)
+        if test_case is None:
+            return
+        self.test_counts.count(test_case, test_case.status, -1)
+        test_case.status = status
+        self.test_counts.count(test_case, status)
+        self.writer.append(self._generate_fragment(f'{test_name}_status',
+                                                   f'<td id="{test_name}_status" class="{status.lower()}">{status}</td>',
+                                                   'replace'))
 
-    def generate_summary(self):
-        total_tests = len(self.test_cases)
-        passed_tests = sum(1 for tc in self.test_cases if tc['status'].lower() == 'pass')
-        failed_tests = sum(1 for tc in self.test_cases if tc['status'].lower() == 'failed')
-        not_run_tests = total_tests - (passed_tests + failed_tests)
+    def _generate_summary(self):
+        passed_tests, failed_tests, not_run_tests = self.test_counts.total[:3]
+        total_tests = passed_tests + failed_tests + not_run_tests
+
+        if self.history is not None:
+            # Tests that never ended are stored with their current status so run totals add up
+            for test_name in self.unfinished:
+                self._save_history(self.test_case_index[test_name])
+            self.history.finish_run(self.history_run_id, total_tests, passed_tests, failed_tests, not_run_tests)
 
         # Generate bar chart
         labels = ['Passed', 'Failed', 'Skip']
         values = [passed_tests, failed_tests, not_run_tests]
         colors = ['green', 'red', 'gray']
-
-        plt.bar(labels, values, color=colors)
-        plt.xlabel('Test Status')
-        plt.ylabel('Number of Tests')
-        plt.title('Test Summary')
-        plt.savefig('test_summary.png')
-        plt.close()
+        if self.chart == 'png':
+            chart_html = self._generate_png_chart(labels, values, colors)
+        else:
+            project_counts = {project: counts[:3] for project, counts in self.test_counts.groups['project'].items()}
+            chart_html = (self._generate_svg_bar_chart(labels, values, colors) +
+                          self._generate_svg_project_chart(project_counts, colors))
 
         summary_html = f"""
         <div class="container">
                 <h2>Test Summary</h2>
-                <img src="test_summary.png" alt="Test Summary Bar Graph">
+                <div class="summary-chart">{chart_html}</div>
                 <table class="summary-table">
                     <thead>
                         <tr>
@@ -370,65 +1326,648 @@ class LogHandler:
                         </tr>
                     </tbody>
                 </table>
+                {self._generate_rollup_table('Results per Project', 'Project', 'project')}
+                {self._generate_rollup_table('Results per Script Type', 'Script Type', 'script_type')}
+                {self._generate_rollup_table('Results per Node', 'Node', 'node')}
+                {self._generate_timing_summary()}
+                {self._generate_history_summary()}
         """
 
-        with open(self.log_file_path, 'r+') as file:
-            content = file.read()
-            content = content.replace('<div id="summary">', f'<div id="summary">{summary_html}')
-            file.seek(0)
-            file.write(content)
-            file.truncate()
+        # Details still being rendered must land before the finished marker
+        self._drain_renders()
+        self.writer.append(self._generate_fragment('summary', summary_html))
+        # Lets the page show the final run time instead of ticking the elapsed-time clock forever
+        self.writer.append(f'<template data-finished="{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}"></template>\n')
+        self.flush()
+
+    def progress(self):
+        """Current test and step totals, read from the running counters."""
+        passed, failed, skipped, finished, test_time = self.test_counts.total
+        steps_passed, steps_failed, steps_skipped = self.step_counts.total[:3]
+        return {
+            'tests': passed + failed + skipped, 'passed': passed, 'failed': failed, 'skipped': skipped,
+            'finished': finished, 'test_time': test_time,
+            'steps': steps_passed + steps_failed + steps_skipped, 'steps_passed': steps_passed,
+            'steps_failed': steps_failed, 'steps_skipped': steps_skipped,
+        }
+
+    def _generate_rollup_table(self, title, label, dimension):
+        step_groups = self.step_counts.groups[dimension]
+        rows = []
+        for key, (passed, failed, skipped, finished, total_time) in sorted(self.test_counts.groups[dimension].items()):
+            steps_passed, steps_failed, steps_skipped = step_groups.get(key, (0, 0, 0))[:3]
+            average = self._format_duration(total_time / finished) if finished else '-'
+            rows.append(f"<tr><td>{key}</td><td>{passed + failed + skipped}</td><td>{passed}</td><td>{failed}</td>"
+                        f"<td>{skipped}</td><td>{steps_passed + steps_failed + steps_skipped}</td>"
+                        f"<td>{steps_passed}</td><td>{steps_failed}</td><td>{steps_skipped}</td>"
+                        f"<td>{self._format_duration(total_time)}</td><td>{average}</td></tr>")
+        if not rows:
+            return ''
+        return f"""
+                <h3>{title}</h3>
+                <table class="summary-table">
+                    <thead><tr><th>{label}</th><th>Tests</th><th>Passed</th><th>Failed</th><th>Skip</th>
+                    <th>Steps</th><th>Steps Passed</th><th>Steps Failed</th><th>Steps Skip</th>
+                    <th>Total Time</th><th>Average Time</th></tr></thead>
+                    <tbody>{''.join(rows)}</tbody>
+                </table>
+        """
+
+    def _save_history(self, tc):
+        if tc.name not in self.history_saved:
+            self.history_saved.add(tc.name)
+            self.history.add_test_case(self.history_run_id, tc)
+
+    def _generate_history_summary(self):
+        if self.history is None:
+            return ''
+        trend_rows = ''.join(f"<tr><td>{generated}</td><td>{total}</td><td>{passed}</td><td>{failed}</td>"
+                             f"<td>{skipped}</td><td>{100 * passed / total if total else 0:.1f}%</td></tr>"
+                             for _, generated, total, passed, failed, skipped
+                             in self.history.pass_rate_trend(self.history_runs))
+        regression_rows = ''.join(f"<tr><td>{name}</td><td>{project}</td><td>{self._format_duration(duration)}</td>"
+                                  f"<td>{self._format_duration(average)}</td></tr>"
+                                  for name, project, duration, average
+                                  in self.history.duration_regressions(self.history_runs))
+        flaky_rows = ''.join(f"<tr><td>{name}</td><td>{project}</td><td>{flips}</td><td>{runs}</td></tr>"
+                             for name, project, flips, runs in self.history.flaky_tests(self.history_runs))
+        return f"""
+                <h3>Pass Rate over the Last {self.history_runs} Runs</h3>
+                <table class="summary-table">
+                    <thead><tr><th>Run</th><th>Total</th><th>Passed</th><th>Failed</th><th>Skip</th>
+                    <th>Pass Rate</th></tr></thead>
+                    <tbody>{trend_rows}</tbody>
+                </table>
+                <h3>Duration Regressions</h3>
+                <table class="summary-table">
+                    <thead><tr><th>Test Case</th><th>Project</th><th>Duration</th><th>Previous Average</th></tr></thead>
+                    <tbody>{regression_rows}</tbody>
+                </table>
+                <h3>Flaky Tests</h3>
+                <table class="summary-table">
+                    <thead><tr><th>Test Case</th><th>Project</th><th>Pass/Fail Flips</th><th>Runs</th></tr></thead>
+                    <tbody>{flaky_rows}</tbody>
+                </table>
+        """
+
+    def _generate_timing_summary(self):
+        slowest = sorted(self.slowest, reverse=True)
+        slowest_rows = ''.join(f"<tr><td>{name}</td><td>{self.test_case_index[name].project}</td>"
+                               f"<td>{self._format_duration(duration)}</td></tr>" for duration, name in slowest)
+        stats = self.stats
+        return f"""
+                <p><b>Total test time:</b> {self._format_duration(self.test_counts.total[4])}</p>
+                <h3>Slowest Tests</h3>
+                <table class="summary-table">
+                    <thead><tr><th>Test Case</th><th>Project</th><th>Duration</th></tr></thead>
+                    <tbody>{slowest_rows}</tbody>
+                </table>
+                <p><b>Reporting overhead:</b> {stats.events} events, rendering {stats.render_time:.3f}s,
+                file I/O {stats.io_time:.3f}s, {stats.bytes_written} bytes written</p>
+        """
+
+    @staticmethod
+    def _format_duration(seconds):
+        if seconds is None:
+            return '-'
+        if seconds < 60:
+            return f'{seconds:.3f}s'
+        minutes, seconds = divmod(seconds, 60)
+        hours, minutes = divmod(int(minutes), 60)
+        return f'{hours}h {minutes}m {seconds:.0f}s' if hours else f'{minutes}m {seconds:.1f}s'
+
+    def _generate_png_chart(self, labels, values, colors):
+        # matplotlib is only imported when a PNG chart is requested; the object-oriented Figure API
+        # avoids pyplot's global state so concurrent handlers don't draw on each other's charts.
+        from matplotlib.figure import Figure
+
+        figure = Figure()
+        axes = figure.subplots()
+        axes.bar(labels, values, color=colors)
+        axes.set_xlabel('Test Status')
+        axes.set_ylabel('Number of Tests')
+        axes.set_title('Test Summary')
+        figure.savefig(self.chart_path)
+        return f'<img src="{os.path.basename(self.chart_path)}" alt="Test Summary Bar Graph">'
+
+    @staticmethod
+    def _generate_svg_bar_chart(labels, values, colors, width=480, height=300, margin=40):
+        top = max(values) or 1
+        slot = (width - 2 * margin) / len(values)
+        parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+                 f'viewBox="0 0 {width} {height}" role="img" aria-label="Test Summary Bar Graph">',
+                 f'<text x="{width / 2}" y="20" text-anchor="middle" font-weight="bold">Test Summary</text>',
+                 f'<line x1="{margin}" y1="{height - margin}" x2="{width - margin}" y2="{height - margin}" '
+                 f'stroke="#333"/>']
+        for i, (label, value, color) in enumerate(zip(labels, values, colors)):
+            bar_height = (height - 2 * margin) * value / top
+            x = margin + i * slot + slot * 0.15
+            y = height - margin - bar_height
+            center = margin + i * slot + slot / 2
+            parts.append(f'<rect x="{x:.1f}" y="{y:.1f}" width="{slot * 0.7:.1f}" height="{bar_height:.1f}" '
+                         f'fill="{color}"/>')
+            parts.append(f'<text x="{center:.1f}" y="{y - 5:.1f}" text-anchor="middle">{value}</text>')
+            parts.append(f'<text x="{center:.1f}" y="{height - margin + 20}" text-anchor="middle">{label}</text>')
+        parts.append('</svg>')
+        return ''.join(parts)
+
+    @staticmethod
+    def _generate_svg_project_chart(project_counts, colors, width=480, row_height=24, label_width=120):
+        if not project_counts:
+            return ''
+        top = max(sum(counts) for counts in project_counts.values()) or 1
+        height = 30 + row_height * len(project_counts)
+        parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+                 f'viewBox="0 0 {width} {height}" role="img" aria-label="Tests per Project">',
+                 f'<text x="{width / 2}" y="20" text-anchor="middle" font-weight="bold">Tests per Project</text>']
+        for row, (project, counts) in enumerate(sorted(project_counts.items())):
+            y = 30 + row * row_height
+            x = label_width
+            parts.append(f'<text x="{label_width - 5}" y="{y + row_height * 0.65:.1f}" '
+                         f'text-anchor="end">{project}</text>')
+            for count, color in zip(counts, colors):
+                bar_width = (width - label_width - 40) * count / top
+                if bar_width:
+                    parts.append(f'<rect x="{x:.1f}" y="{y + 2}" width="{bar_width:.1f}" '
+                                 f'height="{row_height - 4}" fill="{color}"><title>{count}</title></rect>')
+                x += bar_width
+            parts.append(f'<text x="{x + 5:.1f}" y="{y + row_height * 0.65:.1f}">{sum(counts)}</text>')
+        parts.append('</svg>')
+        return ''.join(parts)
+
+    @staticmethod
+    def _step_snapshots(step):
+        # Each snapshot is a SnapshotStore future for an (image, thumbnail) pair; the same image attached
+        # several times to one step is shown once
+        return list(dict.fromkeys(future.result() for future in step.snapshot))
+
+    def _render_details(self, tc, log_lines):
+        # Steps carry their snapshot futures until the job is started; see _start_render
+        steps = [[str(step.action), step.status, str(step.detail), step.snapshot, self._format_duration(step.duration)]
+                 for step in tc.steps]
+        shard = None
+        if self.details == 'sharded':
+            shard = self.shard_count
+            self.shard_count += 1
+        job = (tc.name, tc.status, tc.step_counts, self._format_duration(tc.duration), self.details, steps,
+               self.shard_dir, shard, log_lines, self.text_log_url)
+        with self.render_lock:
+            if (self.render_executor is None and not self.renders
+                    and all(future.done() for step in tc.steps for future in step.snapshot)):
+                for step in steps:
+                    step[3] = list(dict.fromkeys(future.result() for future in step[3]))
+                fragment, written = render_test_details(job)
+                self.stats.bytes_written += written
+                self.writer.append(fragment)
+                self._release_steps(tc)
+                return
+            self.render_jobs.append((job, tc))
+            if self.render_executor is None or len(self.render_jobs) >= self.render_chunk:
+                self._submit_render_jobs()
+        self._drain_renders(backlog=self.render_workers * 2 if self.render_executor is not None else None)
+
+    def _submit_render_jobs(self):
+        self._register_exit()
+        entries, self.render_jobs = self.render_jobs, []
+        jobs = [job for job, _ in entries]
+        result = Future()
+        self.renders.append((result, [tc for _, tc in entries]))
+        when_all_done([future for job in jobs for step in job[5] for future in step[3]],
+                      lambda: self._start_render(jobs, result))
+
+    def _start_render(self, jobs, result):
+        # Runs once every snapshot of the jobs is stored, on the thread that stored the last one
+        try:
+            for job in jobs:
+                for step in job[5]:
+                    step[3] = list(dict.fromkeys(future.result() for future in step[3]))
+            rendered = None
+            if self.render_executor is not None:
+                try:
+                    rendered = self.render_executor.submit(render_test_details_chunk, jobs)
+                except RuntimeError:
+                    # The pool is gone once the interpreter starts shutting down, e.g. when close() runs at exit
+                    pass
+            if rendered is None:
+                result.set_result(render_test_details_chunk(jobs))
+                return
+        except Exception as error:
+            result.set_exception(error)
+            return
+
+        def copy_result(rendered):
+            if rendered.exception() is not None:
+                result.set_exception(rendered.exception())
+            else:
+                result.set_result(rendered.result())
+
+        rendered.add_done_callback(copy_result)
+
+    def _drain_renders(self, backlog=0):
+        # Chunks go out strictly in submission order: finished ones at the head of the queue are appended
+        # right away, and the call only waits while more than backlog (if not None) are pending
+        with self.render_lock:
+            if backlog == 0 and self.render_jobs:
+                self._submit_render_jobs()
+            while self.renders and ((backlog is not None and len(self.renders) > backlog)
+                                    or self.renders[0][0].done()):
+                result, test_cases = self.renders.popleft()
+                try:
+                    rendered = result.result()
+                except Exception:
+                    self.logger.exception("Failed to render the details of %s", ', '.join(tc.name for tc in test_cases))
+                    rendered = []
+                for fragment, written in rendered:
+                    self.stats.bytes_written += written
+                    self.writer.append(fragment)
+                for tc in test_cases:
+                    self._release_steps(tc)
+
+    def _release_steps(self, tc):
+        if self.retain_steps != 'memory':
+            if self.retain_steps == 'spill':
+                self._spill_steps(tc)
+            tc.steps = []
+
+    def flush(self):
+        # In queue mode the writer thread owns the report and the journal, so other threads ask it to flush
+        # and wait until it has
+        if (self.queue is not None and self.writer_thread.is_alive()
+                and threading.current_thread() is not self.writer_thread):
+            with self.flush_done:
+                self.flush_requests += 1
+                token = self.flush_requests
+            self.queue.put(('flush', (token,), time.monotonic()))
+            with self.flush_done:
+                self.flush_done.wait_for(lambda: self.flushed >= token or not self.writer_thread.is_alive())
+            return
+        self._flush()
+
+    def _flush(self):
+        if self.writer is not None:
+            self._drain_renders()
+            self.writer.flush()
+        if self.journal is not None:
+            self.journal.flush()
+
+    def _log_execution_start(self, test_name):
+        test_case = self.test_case_index.get(test_name)
+        if test_case is not None:
+            test_case.start_time = self.event_time
+
+    def _log_action_result(self, test_name, step_number, action, detail, status, *args):
+        self._add_test_step(test_name, step_number, action, detail, status, *args)
+
+    def _log_execution_end(self, test_name, status, log_lines=None):
+        self._update_test_case_status(test_name, status)
+
+        tc = self.test_case_index.get(test_name)
+        if tc is None:
+            return
+        first_end = tc.end_time is None
+        tc.end_time = self.event_time
+        if tc.start_time is None:
+            tc.start_time = tc.end_time
+        if first_end:
+            self.unfinished.discard(test_name)
+            self.test_counts.add_time(tc, tc.duration)
+            if len(self.slowest) < self.slowest_count:
+                heapq.heappush(self.slowest, (tc.duration, test_name))
+            elif self.slowest_count:
+                heapq.heappushpop(self.slowest, (tc.duration, test_name))
+        self.writer.append(self._generate_fragment(f'{test_name}_duration',
+                                                   f'<td id="{test_name}_duration">{self._format_duration(tc.duration)}'
+                                                   f'</td>', 'replace'))
+        if self.history is not None:
+            self._save_history(tc)
+
+        self._render_details(tc, log_lines)
+
+    def _spill_steps(self, tc):
+        data = (json.dumps({'test': tc.name, 'steps': [
+            [step.step_number, str(step.action), str(step.detail), step.status, step.start_time, step.end_time,
+             self._step_snapshots(step)] for step in tc.steps]}, default=str) + '\n').encode('utf-8')
+        started = time.perf_counter()
+        # Steps may be spilled on whichever thread drains the render queue; the offset is only published once
+        # the line is written, so load_steps never reads a partial record
+        with self.spill_lock:
+            self.spill_file.seek(0, os.SEEK_END)
+            offset = self.spill_file.tell()
+            self.spill_file.write(data)
+            self.spill_offsets[tc.name] = offset
+        self.stats.record_io(started, len(data))
+
+    def load_steps(self, test_name):
+        """Steps of a test, read back from the spill file if they were moved out of memory."""
+        tc = self.test_case_index[test_name]
+        offset = self.spill_offsets.get(test_name)
+        if offset is None:
+            return tc.steps
+        with self.spill_lock:
+            if not self.spill_file.closed:
+                self.spill_file.flush()
+            with open(self.spill_path, 'rb') as file:
+                file.seek(offset)
+                record = json.loads(file.readline())
+        return [TestStep(test_name, step_number, action, detail, status, tuple(map(tuple, snapshots)),
+                         start_time, end_time)
+                for step_number, action, detail, status, start_time, end_time, snapshots in record['steps']]
+
+    def add_test_case(self, test_name, project, script_type):
+        self._dispatch('add_test_case', test_name, project, script_type)
+
+    def add_test_step(self, test_name, step_number, action, detail, status, *args):
+        self._dispatch('add_test_step', test_name, step_number, action, detail, status, *args)
+
+    def update_test_case_status(self, test_name, status):
+        self._dispatch('update_test_case_status', test_name, status)
+
+    def generate_summary(self):
+        self._dispatch('generate_summary')
 
     def log_execution_start(self, test_name):
-        pass
+        current_test.set(test_name)
+        self._dispatch('log_execution_start', test_name)
 
     def log_action_result(self, test_name, step_number, action, detail, status, *args):
-        self.add_test_step(test_name, step_number, action, detail, status, *args)
+        self._dispatch('log_action_result', test_name, step_number, action, detail, status, *args)
 
     def log_execution_end(self, test_name, status):
-        self.update_test_case_status(test_name, status)
-
-        with open(self.log_file_path, 'r+') as file:
-            content = file.read()
-            log_details_content = ""
-            for tc in self.test_cases:
-                if tc['name'] == test_name:
-                    passed_actions = sum(1 for action in tc['steps'] if action['status'].lower() == 'pass')
-                    failed_actions = sum(1 for action in tc['steps'] if action['status'].lower() == 'failed')
-                    not_run_actions = sum(1 for action in tc['steps'] if action['status'].lower() == 'Skip')
-
-                    tc_status_color = '#4CAF50' if tc['status'].lower() == 'pass' else '#f44336'
-                    log_details_content += (f"<button type='button' class='collapsible'><span class='collapsible-sign'>"
-                                            f"+</span> <span class='collapsible-text' style='background-color: "
-                                            f"{tc_status_color}; color: white;'>{tc['name']}</span></button>")
-                    log_details_content += (f"<div class='collapsible-content'><p>Summary: <b>Total:"
-                                            f"</b> {passed_actions + failed_actions + not_run_actions},  "
-                                            f"<b style='color:green;'>Passed:</b> {passed_actions}, "
-                                            f"<b style='color:red;'>Failed:</b> {failed_actions}, "
-                                            f"<b style='color:grey;'>Skip:</b> {not_run_actions}</p>")
-
-                    for step in tc['steps']:
-                        action_status_color = '#4CAF50' if step['status'].lower() == 'pass' else '#f44336'
-                        log_details_content += (f"<button type='button' class='collapsible'>"
-                                                f"<span class='collapsible-sign'>+</span> "
-                                                f"<span style='background-color: {action_status_color}; "
-                                                f"color: white;'>{step['action']}</span></button>")
-                        log_details_content += "<div class='collapsible-content'>"
-                        log_details_content += (f"<p>Status: <span class='status-{step['status'].lower()}'>"
-                                                f"{step['status']}</span></p>")
-                        log_details_content += f"<p>Details: {step['detail']}</p>"
-                        if 'snapshot' in step:
-                            snaps = step['snapshot']
-                            for snap in snaps:
-                                log_details_content += f"<img src='{snap}'>"
-                        log_details_content += "</div>"
-
-                    log_details_content += "</div>"
-            content = content.replace('<div id="test_log_information">',
-                                      f'<div id="test_log_information">{log_details_content}')
-            file.seek(0)
-            file.write(content)
-            file.truncate()
+        if current_test.get() == test_name:
+            current_test.set(None)
+        self._dispatch('log_execution_end', test_name, status)
+
+    def client(self):
+        if self.queue is None:
+            raise ValueError("client() is only available when LogHandler is created with a queue_mode")
+        return LogClient(self.queue)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        atexit.unregister(self.close)
+        if self.queue is not None:
+            self.queue.put(None)
+            self.writer_thread.join()
+        self.snapshots.close()
+        try:
+            self.flush()
+        finally:
+            # Whatever is pending reaches the report even if draining the details failed
+            if self.writer is not None:
+                self.writer.flush()
+            if self.render_executor is not None:
+                self.render_executor.shutdown()
+        if self.journal is not None:
+            self.journal.close()
+        if self.history is not None:
+            self.history.close()
+        if self.spill_file is not None:
+            self.spill_file.close()
+        self.logger.removeHandler(self.handler)
+        self.handler.close()
+        if self.test_logs is not None:
+            self.logger.removeHandler(self.test_logs)
+            self.test_logs.close()
+
+    def _dispatch(self, event, *args):
+        self._submit(event, args, time.monotonic())
+
+    def _submit(self, event, args, timestamp):
+        if self.queue is not None:
+            self.queue.put((event, args, timestamp))
+        else:
+            with self.lock:
+                self._apply(event, args, timestamp)
+
+    def _apply(self, event, args, timestamp=None):
+        # Step and test timings use the time the event was logged, which for queued or journaled
+        # events is earlier than the time it is applied here
+        self.event_time = time.monotonic() if timestamp is None else timestamp
+        started = time.perf_counter()
+        io_before = self.stats.io_time
+        if event == 'log_execution_end' and len(args) == 2 and self.test_logs is not None:
+            # A test's log lines are taken when its end is applied, whoever logged it, and travel with the
+            # event so the journal keeps them too
+            args = (*args, self.test_logs.take(args[0]))
+        if self.journal is not None:
+            self.journal.record(event, args, self.event_time)
+        if self.report:
+            getattr(self, '_' + event)(*args)
+            if self.renders:
+                self._drain_renders(backlog=None)
+            if self.flush_every is not None:
+                self.unflushed_events += 1
+                if self.unflushed_events >= self.flush_every:
+                    self.unflushed_events = 0
+                    self.writer.flush()
+        self.stats.events += 1
+        self.stats.render_time += time.perf_counter() - started - (self.stats.io_time - io_before)
+
+    def _process_queue(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            event, args, timestamp = item
+            if event == 'flush':
+                try:
+                    self._flush()
+                except Exception:
+                    self.logger.exception("Failed to flush the report")
+                finally:
+                    with self.flush_done:
+                        self.flushed = max(self.flushed, args[0])
+                        self.flush_done.notify_all()
+                continue
+            try:
+                self._apply(event, args, timestamp)
+            except Exception:
+                self.logger.exception("Failed to process %s event", event)
+
+
+class AsyncLogHandler:
+    """asyncio front end for LogHandler.
+
+    The awaitable methods put events on a bounded ``asyncio.Queue`` and a
+    worker task applies them in batches on a thread, so rendering and file
+    I/O never run on the event loop.  When ``max_pending`` events are waiting
+    the producers are suspended until the worker catches up.
+    """
+
+    def __init__(self, log_file_path, max_pending=1000, batch_size=100, **options):
+        # A queue_mode queue is unbounded and would take events off the bounded one, so max_pending no longer
+        # limited how many are waiting
+        if options.get('queue_mode') is not None:
+            raise ValueError("AsyncLogHandler already queues events; queue_mode is not supported")
+        self.log_handler = LogHandler(log_file_path, **options)
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.batch_size = batch_size
+        self.worker = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+
+    async def add_test_case(self, test_name, project, script_type):
+        await self._put('add_test_case', test_name, project, script_type)
+
+    async def add_test_step(self, test_name, step_number, action, detail, status, *args):
+        await self._put('add_test_step', test_name, step_number, action, detail, status, *args)
+
+    async def update_test_case_status(self, test_name, status):
+        await self._put('update_test_case_status', test_name, status)
+
+    async def log_execution_start(self, test_name):
+        current_test.set(test_name)
+        await self._put('log_execution_start', test_name)
+
+    async def log_action_result(self, test_name, step_number, action, detail, status, *args):
+        await self._put('log_action_result', test_name, step_number, action, detail, status, *args)
+
+    async def log_execution_end(self, test_name, status):
+        if current_test.get() == test_name:
+            current_test.set(None)
+        await self._put('log_execution_end', test_name, status)
+
+    async def generate_summary(self):
+        # Returns once the summary, and everything logged before it, is in the report
+        await self._put('generate_summary')
+        await self.queue.join()
+
+    async def close(self):
+        if self.worker is not None:
+            await self.queue.join()
+            self.worker.cancel()
+            self.worker = None
+        await asyncio.to_thread(self.log_handler.close)
+
+    async def _put(self, event, *args):
+        if self.worker is None:
+            self.worker = asyncio.get_running_loop().create_task(self._process_queue())
+        await self.queue.put((event, args, time.monotonic()))
+
+    async def _process_queue(self):
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            try:
+                await asyncio.to_thread(self._apply_batch, batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _apply_batch(self, batch):
+        for event, args, timestamp in batch:
+            try:
+                self.log_handler._submit(event, args, timestamp)
+            except Exception:
+                self.log_handler.logger.exception("Failed to process %s event", event)
+
+
+def read_journal(journal_path):
+    """Yield the records of a journal one at a time, skipping a line cut short by a crash."""
+    with open(journal_path, encoding='utf-8') as file:
+        for line in file:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def journal_base_dirs(journal_path, header):
+    # Relative snapshot paths are relative to the directory the run was started in; a journal copied from
+    # another machine falls back to its own directory
+    base_dirs = [os.path.dirname(os.path.abspath(journal_path))]
+    if header.get('cwd'):
+        base_dirs.insert(0, header['cwd'])
+    return base_dirs
+
+
+def resolve_snapshot_path(path, base_dirs):
+    if os.path.isabs(path):
+        return path
+    for base_dir in base_dirs:
+        candidate = os.path.join(base_dir, path)
+        if os.path.exists(candidate):
+            return candidate
+    return os.path.join(base_dirs[0], path)
+
+
+def render_journal(journal_path, log_file_path, **options):
+    """Build the HTML report for a journal in one streaming pass."""
+    records = read_journal(journal_path)
+    header = next(records, None)
+    if header is None or header.get('event') != 'start':
+        raise ValueError(f"{journal_path} is not a LogHandler journal")
+    options.setdefault('buffered', True)
+    options.setdefault('flush_every', 1000)
+    options.setdefault('flush_interval', None)
+    options.setdefault('retain_steps', 'drop')
+    log_handler = LogHandler(log_file_path, generation_time=header['generation_time'], **options)
+    base_dirs = journal_base_dirs(journal_path, header)
+    summarized = False
+    for record in records:
+        event, args = record['event'], record['args']
+        if event in STEP_EVENTS:
+            args[5:] = [resolve_snapshot_path(path, base_dirs) for path in args[5:]]
+        summarized = summarized or event == 'generate_summary'
+        log_handler._apply(event, args, record.get('time'))
+    # A journal cut short by a crash has no summary; add one so the report shows the totals and counts as finished
+    if not summarized:
+        log_handler._apply('generate_summary', [])
+    log_handler.close()
+    return log_handler
+
+
+# Events whose first argument is a test name; snapshot paths follow the status of step events
+TEST_EVENTS = ('add_test_case', 'add_test_step', 'update_test_case_status', 'log_execution_start',
+               'log_action_result', 'log_execution_end')
+STEP_EVENTS = ('add_test_step', 'log_action_result')
+
+
+def merge_journals(journal_paths, log_file_path, node_names=None, **options):
+    """Combine the journals of several nodes into one report.
+
+    Journals are streamed one after another, so memory is bounded by the
+    merged run's test records rather than by the size of any node's output.
+    Test names are prefixed with the node name to keep them unique, relative
+    snapshot paths are resolved against the node's working directory (or the
+    journal's directory if that doesn't exist here) and the snapshots are
+    re-stored by content hash, so duplicates are kept once.
+    """
+    if node_names is None:
+        node_names = [os.path.splitext(os.path.basename(path))[0] for path in journal_paths]
+        if len(set(node_names)) < len(node_names):
+            node_names = [os.path.basename(os.path.dirname(os.path.abspath(path))) for path in journal_paths]
+    options.setdefault('buffered', True)
+    options.setdefault('flush_every', 1000)
+    options.setdefault('flush_interval', None)
+    options.setdefault('retain_steps', 'drop')
+    log_handler = LogHandler(log_file_path, **options)
+    for journal_path, node in zip(journal_paths, node_names):
+        records = read_journal(journal_path)
+        header = next(records, None)
+        if header is None or header.get('event') != 'start':
+            raise ValueError(f"{journal_path} is not a LogHandler journal")
+        base_dirs = journal_base_dirs(journal_path, header)
+        for record in records:
+            event, args = record['event'], record['args']
+            if event not in TEST_EVENTS:
+                continue
+            args = [f'{node}/{args[0]}'] + args[1:]
+            if event == 'add_test_case':
+                args.append(node)
+            elif event in STEP_EVENTS:
+                args[5:] = [resolve_snapshot_path(path, base_dirs) for path in args[5:]]
+            log_handler._apply(event, args, record.get('time'))
+    log_handler._apply('generate_summary', [])
+    log_handler.close()
+    return log_handler
 
 
 if __name__ == "__main__":
@@ -0,0 +1,27 @@
+import argparse
+
+from main import merge_journals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Merge the LogHandler journals of several nodes into one report.')
+    parser.add_argument('journals', nargs='+', help='JSONL journals written by LogHandler(journal_path=...)')
+    parser.add_argument('-o', '--output', default='log.html', help='combined report to write')
+    parser.add_argument('--names', nargs='+', help='node names, one per journal (default: from the file names)')
+    parser.add_argument('--snapshot-dir', default='snapshots', help='directory for the merged snapshots')
+    parser.add_argument('--chart', choices=('svg', 'png'), default='svg', help='summary chart backend')
+    parser.add_argument('--details', choices=('lazy', 'inline', 'sharded'), default='lazy',
+                        help='embed step details as JSON, as HTML, or in per-test shard files')
+    parser.add_argument('--render-workers', type=int, default=0,
+                        help='render the per-test details on this many worker processes')
+    args = parser.parse_args(argv)
+    if args.names is not None and len(args.names) != len(args.journals):
+        parser.error('--names needs one name per journal')
+
+    merge_journals(args.journals, args.output, args.names, snapshot_dir=args.snapshot_dir, chart=args.chart,
+                   details=args.details, render_workers=args.render_workers)
+    print(f"Merged report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+import argparse
+import os
+
+from main import render_journal
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render the HTML test report from a LogHandler journal.')
+    parser.add_argument('journal', help='JSONL journal written by LogHandler(journal_path=...)')
+    parser.add_argument('-o', '--output', help='report to write (default: the journal name with .html)')
+    parser.add_argument('--snapshot-dir', default='snapshots', help='directory for error snapshots')
+    parser.add_argument('--chart', choices=('svg', 'png'), default='svg', help='summary chart backend')
+    parser.add_argument('--details', choices=('lazy', 'inline', 'sharded'), default='lazy',
+                        help='embed step details as JSON, as HTML, or in per-test shard files')
+    parser.add_argument('--render-workers', type=int, default=0,
+                        help='render the per-test details on this many worker processes')
+    args = parser.parse_args(argv)
+
+    output = args.output or os.path.splitext(args.journal)[0] + '.html'
+    render_journal(args.journal, output, snapshot_dir=args.snapshot_dir, chart=args.chart,
+                   details=args.details, render_workers=args.render_workers)
+    print(f"Report written to {output}")
+
+
+if __name__ == '__main__':
+    main()